@@ -143,6 +143,28 @@ def get_item_support(item, frequency_set, num_transactions, count=False):
     return float(support_count)/num_transactions
 
 
+def filter_itemsets_by_support(itemsets_dict, frequency_set, min_support, num_transactions):
+    """ Given the k-itemsets generated by the apriori algorithm for some
+        minimum support, return the k-itemsets that also satisfy a higher
+        min_support. Every itemset that is frequent at the higher support
+        is frequent at the lower support, so the result is the same as
+        running the apriori algorithm again with the higher min_support.
+
+        @Input: itemsets_dict, frequency_set, min_support, num_transactions
+        @Return: filtered_itemsets_dict
+    """
+    filtered_itemsets_dict = dict()
+
+    for k, itemsets in itemsets_dict.items():
+        frequent_itemsets = set([item for item in itemsets if float(frequency_set[item])/num_transactions >= min_support])
+
+        # if no k-itemsets are frequent, no (k+1)-itemsets can be frequent either
+        if len(frequent_itemsets) == 0:
+            break
+        filtered_itemsets_dict[k] = frequent_itemsets
+    return filtered_itemsets_dict
+
+
 def generate_itemsets_with_adequate_support(items, transactions, min_support, frequency_set):
     """ Given a set of items, the list of transactions, we want to return the
         subset of the set of items where that set satisfies the minimum support
@@ -24,10 +24,12 @@
            So, this would allow us to easily compare our results to Weka's, which is one of the
            requirements of the homework.
 '''
+import os
 import sys
 import csv
 import json
 import pprint
+import multiprocessing
 
 from collections import defaultdict
 from functools import reduce
@@ -175,4 +177,261 @@ def create_encoded_data(file_data, data_to_int):
             temp_arr.append(newElement)
         new_line = ','.join(map(str,temp_arr))
         result_array.append(new_line)
-    return result_array
\ No newline at end of file
+    return result_array
+
+
+'''
+    ----------------------------------------------------------------------------------------------------
+                                    PARALLEL ARFF PARSING & ENCODING METHODS                                            
+    ----------------------------------------------------------------------------------------------------
+
+    The methods above handle the file one line at a time and then re-split every row to build
+    the encoding dictionaries, which becomes the bottleneck on large files. The methods below
+    produce the same encoded_data, data_to_integer and integer_to_data as running
+    parse_arff_file and convert_original_file_data_to_encoded_data, but they do it in parallel:
+
+    1. Parse the (small) header serially and remember the byte offset where the @data section starts
+    2. Split the @data section into byte-range chunks, one or more per worker process
+    3. Each worker parses and encodes its chunk with its own local attribute-value dictionary
+    4. The local dictionaries are merged in chunk order, so every attribute-value gets the same
+       integer it would have gotten from the serial version, and each chunk's rows are remapped
+       from local integers to the global integers
+'''
+
+
+def parse_and_encode_arff_file_parallel(filename, num_workers=None):
+    """ Parse and encode the arff file given to the program by the
+        user with a pool of worker processes. The result is identical
+        to calling parse_arff_file followed by
+        convert_original_file_data_to_encoded_data.
+
+        @Input: filename, num_workers (defaults to the number of cpus)
+        @Return: encoded_data, data_to_integer, integer_to_data
+    """
+    if num_workers is None or num_workers < 1:
+        num_workers = multiprocessing.cpu_count()
+
+    header_arr, data_offset = parse_arff_header(filename)
+    chunks = split_data_section_into_chunks(filename, data_offset, num_workers)
+    chunk_args = [(filename, header_arr, data_offset, start, end) for start, end in chunks]
+
+    if num_workers == 1 or len(chunk_args) <= 1:
+        chunk_results = [parse_and_encode_chunk(args) for args in chunk_args]
+    else:
+        with multiprocessing.Pool(processes=num_workers) as pool:
+            chunk_results = pool.map(parse_and_encode_chunk, chunk_args)
+
+    encoded_data, data_to_integer, integer_to_data = merge_encoded_chunks(chunk_results)
+
+    print(">> Finished parsing arff file with " + str(num_workers) + " workers. Found " + str(len(header_arr)) + " header attributes and " + str(len(encoded_data)) + " file contents instances.")
+    return encoded_data, data_to_integer, integer_to_data
+
+
+def parse_arff_header(filename):
+    """ Parse the header attributes of the arff file and find the
+        byte offset of the first line after the @data attribute.
+
+        @Input: filename
+        @Return: header_arr, data_offset
+    """
+    header_arr = []
+    offset = 0
+
+    with open(filename, 'rb') as fp:
+        for raw_line in _read_lines(fp):
+            offset += len(raw_line)
+            line = _decode_line(raw_line)
+
+            if '%' in line:
+                line = line[:line.index('%')]
+
+                # Entire line was a comment
+                if len(line) == 0:
+                    continue
+
+            line = line.split(" ")
+
+            # Line begins with @attribute and should be stored in the header array
+            if line[0].lower() == '@attribute':
+                line = line[1].replace('\t',' ')
+                line = line.split(" ")
+
+                if len(line[0]) > 1:
+                    line = line[0]
+                header_arr.append(line)
+            # Line begins with @data and the data starts immediately after this line
+            elif line[0][:-1].lower() == '@data':
+                return header_arr, offset
+
+    # No @data attribute, so there is nothing to read
+    return header_arr, offset
+
+
+def split_data_section_into_chunks(filename, data_offset, num_workers, chunks_per_worker=4):
+    """ Split the @data section of the file into byte ranges. The ranges
+        do not have to line up with line boundaries, since each worker
+        only reads the lines that start inside of its own range.
+
+        @Input: filename, data_offset, num_workers, chunks_per_worker
+        @Return: list of (start, end) byte offsets
+    """
+    file_size = os.path.getsize(filename)
+    data_size = file_size - data_offset
+
+    if data_size <= 0:
+        return []
+
+    num_chunks = max(1, min(num_workers * chunks_per_worker, data_size))
+    chunk_size = -(-data_size // num_chunks)
+
+    return [(start, min(start + chunk_size, file_size)) for start in range(data_offset, file_size, chunk_size)]
+
+
+def parse_and_encode_chunk(args):
+    """ Parse the lines of data that start inside the byte range of a
+        chunk, prepend the column names and encode them with a dictionary
+        local to this chunk. Runs inside of a worker process.
+
+        local_data is the list of attribute-values in the order they were
+        first seen in this chunk, so local integer i maps to local_data[i].
+
+        @Input: (filename, header_arr, data_offset, start, end)
+        @Return: encoded_rows, local_data
+    """
+    filename, header_arr, data_offset, start, end = args
+    encoded_rows = []
+    local_data = []
+    local_data_to_integer = {}
+
+    with open(filename, 'rb') as fp:
+        # Start one byte early so that we can tell whether a line starts exactly at the
+        # start of this chunk. Any line that starts before it belongs to the previous chunk
+        position = start - 1 if start > data_offset else start
+        fp.seek(position)
+
+        for raw_line in _read_lines(fp):
+            line_start = position
+            position += len(raw_line)
+
+            if line_start < start:
+                continue
+            if line_start >= end:
+                break
+
+            line = clean_data_line(_decode_line(raw_line))
+            if line is None:
+                continue
+
+            temp_arr = []
+            for i, element in enumerate(line.split(',')):
+                if element == 'NULL':
+                    continue
+
+                newElement = header_arr[i] + '=' + element
+                local_idx = local_data_to_integer.get(newElement)
+                if local_idx is None:
+                    local_idx = len(local_data)
+                    local_data_to_integer[newElement] = local_idx
+                    local_data.append(newElement)
+                temp_arr.append(local_idx)
+            encoded_rows.append(temp_arr)
+    return encoded_rows, local_data
+
+
+def clean_data_line(line):
+    """ Clean a single line of data the same way parse_arff_file does.
+
+        @Input: line
+        @Return: cleaned line or None if the line has no data
+    """
+    if '%' in line:
+        line = line[:line.index('%')]
+
+        # Entire line was a comment
+        if len(line) == 0:
+            return None
+
+    # If the line has no spaces, it is either the entire line or an empty line
+    if ' ' not in line:
+        line = line.replace('\n', '')
+
+        # Line was simply a newline symbol
+        if line == '':
+            return None
+        return line
+
+    # Line of data had spaces in it and we must clean the line of data to get ride of spaces
+    # and possibly null characters
+    line = line.replace(' ', '')
+    # ? symbol can be used to denote missing data in arff file
+    if '?' in line:
+        line = line.replace('?','NULL')
+    return line.replace('\n', '').replace('\t','')
+
+
+def merge_encoded_chunks(chunk_results):
+    """ Merge the local dictionaries of each chunk into the global
+        data_to_integer and integer_to_data dictionaries and remap the
+        encoded rows of each chunk to the global integers. Chunks are
+        merged in file order, so the integers match the serial encoding.
+
+        @Input: chunk_results
+        @Return: encoded_data, data_to_integer, integer_to_data
+    """
+    encoded_data = []
+    data_to_integer = {}
+    integer_to_data = {}
+    idx = 1
+
+    for encoded_rows, local_data in chunk_results:
+        local_to_global = []
+        for element in local_data:
+            if element not in data_to_integer:
+                data_to_integer[element] = idx
+                integer_to_data[str(idx)] = element
+                idx += 1
+            local_to_global.append(str(data_to_integer[element]))
+
+        for row in encoded_rows:
+            encoded_data.append(','.join([local_to_global[i] for i in row]))
+    return encoded_data, data_to_integer, integer_to_data
+
+
+def _read_lines(fp, block_size=1 << 16):
+    """ Read the lines of a file opened in binary mode from its current
+        position. Just like reading the file in text mode, a line can end
+        with \\n, \\r\\n or only \\r. Each line keeps its line ending, so the
+        lengths of the lines add up to the number of bytes read.
+    """
+    remainder = b''
+
+    while True:
+        block = fp.read(block_size)
+        if not block:
+            break
+
+        lines = (remainder + block).splitlines(True)
+        remainder = b''
+
+        # The last line is not finished unless it ends with \n. If it ends
+        # with \r, the \n of a \r\n could still be in the next block
+        if not lines[-1].endswith(b'\n'):
+            remainder = lines.pop()
+
+        for line in lines:
+            yield line
+
+    if remainder:
+        yield remainder
+
+
+def _decode_line(raw_line):
+    """ Decode a line read in binary mode and normalize the line ending
+        to match what reading the file in text mode would give us.
+    """
+    line = raw_line.decode('utf-8')
+    if line.endswith('\r\n'):
+        line = line[:-2] + '\n'
+    elif line.endswith('\r'):
+        line = line[:-1] + '\n'
+    return line
@@ -13,11 +13,13 @@
     4. Terminate when no frequent itemsets or candidate set can be generated
 '''
 
+import os
 import sys
 import csv
 import json
 import time
 import pprint
+import multiprocessing
 
 import numpy as np
 import fileUtils as fu
@@ -27,6 +29,12 @@ import apriori as apriori
 from collections import defaultdict
 from pathlib import Path
 
+# resource is only available on unix, so peak memory is not reported on windows
+try:
+    import resource
+except ImportError:
+    resource = None
+
 
 def main():
     """ Main function deals with parsing user input and calling appropriate functions
@@ -35,6 +43,7 @@ def main():
         - normal apriori execution and association rule generation
         - stress testing the runtime and number of rules generated
           by the algorithm
+        - running a batch of jobs described by a json manifest
 
         @Input: None
         @Return: None
@@ -44,13 +53,44 @@ def main():
 
     min_confidence = 0
     min_support = 0
+    num_workers = 0
     input_filename = ''
     output_filename = ''
 
     arg_length = len(sys.argv)
 
+    # Optionally parse and encode the input file with a pool of worker processes
+    if '-p' in sys.argv:
+        idx = sys.argv.index('-p')
+
+        try:
+            num_workers = int(sys.argv[idx+1])
+            print("Using the specified value for number of workers: " + str(num_workers))
+        except:
+            print("Incorrect paramter specification. Exiting...")
+            sys.exit()
+
+    # Start the batch version of the program
+    if '--batch' in sys.argv:
+        idx = sys.argv.index('--batch')
+
+        if idx+1 < arg_length:
+            manifest_filename = sys.argv[idx+1]
+
+            manifest_file = Path(manifest_filename)
+            if not manifest_file.exists() or not manifest_file.is_file():
+                print("Filename: {} does not exist. Exiting...".format(manifest_file))
+                sys.exit()
+
+            print("Using the specified value for batch manifest: " + str(manifest_filename))
+        else:
+            print("Incorrect paramter specification. Exiting...")
+            sys.exit()
+
+        run_batch_jobs(manifest_filename, num_workers)
+        return
     # Start the stress test version of the program
-    if '--stress-test' in sys.argv:
+    elif '--stress-test' in sys.argv:
         delta = 0
         lower_bound = 0
         confidence = 0
@@ -95,11 +135,11 @@ def main():
                 print("Incorrect paramter specification. Exiting...")
                 sys.exit()
 
-        stress_test_apriori(input_filename, delta, lower_bound, confidence)
+        stress_test_apriori(input_filename, delta, lower_bound, confidence, num_workers)
         return
     # Start the normal execution of the program - calling the apriori algorithm and rule generation
     else:
-        if arg_length > 9:
+        if arg_length > 11:
             print("Too many parameters. Exiting...")
             sys.exit()
         else:
@@ -155,14 +195,40 @@ def main():
                 min_support = .5
                 print("Using the default value for min_support: " + str(min_confidence))
 
-    header_arr, file_contents = fu.parse_arff_file(input_filename)
-    encoded_data, data_to_integer, integer_to_data = fu.convert_original_file_data_to_encoded_data(header_arr, file_contents)
+    encoded_data, data_to_integer, integer_to_data = load_and_encode_data(input_filename, num_workers)
 
     print(">> Creating transaction list and generating items")
     transaction_list, items = apriori.get_transactions_and_items_data(encoded_data)
     run_apriori_and_generate_rules(transaction_list, items, min_support, min_confidence, output_filename)
 
 
+def load_and_encode_data(input_filename, num_workers=0):
+    """ Parse and encode the input file, either with the serial methods or with
+        a pool of worker processes, and report the ingest throughput.
+
+        @Input:
+        input_filename: the input filename from which the program will read data
+        num_workers: number of worker processes to parse and encode the file with.
+                     If set to 0, the file is parsed and encoded serially.
+
+        @Return: encoded_data, data_to_integer, integer_to_data
+    """
+    # START timer before the file is read
+    start = time.time()
+    if num_workers > 0:
+        encoded_data, data_to_integer, integer_to_data = fu.parse_and_encode_arff_file_parallel(input_filename, num_workers)
+    else:
+        header_arr, file_contents = fu.parse_arff_file(input_filename)
+        encoded_data, data_to_integer, integer_to_data = fu.convert_original_file_data_to_encoded_data(header_arr, file_contents)
+    end = time.time()
+    # END timer after the data is encoded
+
+    megabytes = os.path.getsize(input_filename) / (1024 * 1024)
+    throughput = megabytes / max(end-start, 1e-9)
+    print(">> Ingest of " + str(round(megabytes, 2)) + " MB took " + str(end-start) + ". Throughput was " + str(round(throughput, 2)) + " MB/s.")
+    return encoded_data, data_to_integer, integer_to_data
+
+
 def run_apriori_and_generate_rules(transactions, items, min_support, min_confidence, output_filename, output_rules=True):
     """ Take the necessary parameters after the main function parses the CLI arguments to start
         the apriori algorithm and generate all association rules.
@@ -226,7 +292,7 @@ def serialize_rules(global_itemset_dict, association_rules, output_header, outpu
     file.close()
 
 
-def stress_test_apriori(input_filename, delta, lower_bound, confidence):
+def stress_test_apriori(input_filename, delta, lower_bound, confidence, num_workers=0):
     """ Run the apriori algorithm from a minimum support of 1.0. Decrement the 
         minimum_support by delta, run the algorithm again. Continue while 
         minimum_support is greater than lower_bound.
@@ -242,6 +308,8 @@ def stress_test_apriori(input_filename, delta, lower_bound, confidence):
         lower_bound: the lowest value of minimum support to consider when stress
                      testing the apriori algorithm and number of rules generated
         confidence: minimum confidence to use when generating association rules
+        num_workers: number of worker processes to parse and encode the input file with,
+                     or 0 to parse and encode it serially
         @Return: None
     """
     global integer_to_data
@@ -252,8 +320,7 @@ def stress_test_apriori(input_filename, delta, lower_bound, confidence):
     fixed_confidence = float(confidence)
     lower_bound = float(lower_bound)
 
-    header_arr, file_contents = fu.parse_arff_file(input_filename)
-    encoded_data, data_to_integer, integer_to_data = fu.convert_original_file_data_to_encoded_data(header_arr, file_contents)
+    encoded_data, data_to_integer, integer_to_data = load_and_encode_data(input_filename, num_workers)
 
     transaction_list, items = apriori.get_transactions_and_items_data(encoded_data)
     N = len(transaction_list)
@@ -295,5 +362,368 @@ def stress_test_apriori(input_filename, delta, lower_bound, confidence):
     # plt.show()
 
 
+'''
+    ----------------------------------------------------------------------------------------------------
+                                            BATCH METHODS                                             
+    ----------------------------------------------------------------------------------------------------
+
+    Running a grid of (min_support, min_confidence, algorithm) jobs as separate invocations of
+    the program reparses and re-encodes the same file for every job. The batch version reads a
+    json manifest of the form:
+
+    {
+        "workers": 4,
+        "output_dir": "batch_output",
+        "datasets": {"vote": "../Data/vote.arff"},
+        "jobs": [
+            {"dataset": "vote", "min_support": 0.4, "min_confidence": 0.9, "algorithm": "apriori"},
+            {"dataset": "vote", "min_support": 0.5, "min_confidence": 0.75, "name": "vote-default"}
+        ]
+    }
+
+    Relative paths are relative to the directory of the manifest. Each dataset is loaded and
+    encoded once. Since every itemset that is frequent at some support is also frequent at any
+    lower support, the itemsets of each dataset are only generated once, at the lowest support of
+    its jobs, and every job then filters those itemsets for its own support before generating rules.
+
+    The seed itemsets of all datasets are generated first, in parallel. The encoded transactions
+    and the seed itemsets are then handed to every worker process in the job pool once, when it
+    starts, so each job only has to send the job parameters to the worker.
+
+    The peak memory reported for a job (or for generating the itemsets of a dataset) is the peak
+    resident memory of the worker process while it ran that job, which includes the transactions
+    and seed itemsets held by the worker. The peak is reset before every job on linux. Where it
+    cannot be reset, every job is run in a fresh worker process instead, which is slower because
+    the transactions and seed itemsets then have to be handed to a new worker for every job.
+
+    The wall time reported for a job only covers filtering the seed itemsets, generating the rules
+    and writing them. The time spent generating the seed itemsets is reported once per dataset.
+'''
+
+BATCH_ALGORITHMS = ('apriori',)
+
+# dataset name -> (transaction_list, items, integer_to_data), set in every batch worker process
+batch_datasets = {}
+# dataset name -> (seed_support, global_itemset_dict, frequency_set), set in every batch worker process
+batch_seeds = {}
+
+
+def run_batch_jobs(manifest_filename, num_ingest_workers=0):
+    """ Load every dataset in the batch manifest once, generate the itemsets of each
+        dataset at the lowest support of its jobs, and then run every job in a pool of
+        worker processes. Each job writes its rules to its own output file, and a summary
+        of the wall time and peak memory of each job is written to summary.json in the
+        output directory.
+
+        @Input:
+        manifest_filename: the json manifest describing the datasets and jobs
+        num_ingest_workers: number of worker processes to parse and encode each dataset with,
+                            or 0 to parse and encode each dataset serially
+
+        @Return: None
+    """
+    manifest = load_batch_manifest(manifest_filename)
+    jobs = manifest['jobs']
+    output_dir = manifest['output_dir']
+
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+
+    datasets = {}
+    dataset_summary = {}
+    for dataset in sorted(set([job['dataset'] for job in jobs])):
+        input_filename = manifest['datasets'][dataset]
+        print(">> Loading dataset " + dataset + " from " + input_filename)
+
+        start = time.time()
+        encoded_data, _, integer_to_data = load_and_encode_data(input_filename, num_ingest_workers)
+        transaction_list, items = apriori.get_transactions_and_items_data(encoded_data)
+        end = time.time()
+
+        datasets[dataset] = (transaction_list, items, integer_to_data)
+        dataset_summary[dataset] = {
+            'filename': input_filename,
+            'transactions': len(transaction_list),
+            'ingest_seconds': end-start,
+        }
+
+    # the lowest support of each dataset seeds all of the higher support jobs of that dataset
+    seed_supports = {}
+    for job in jobs:
+        dataset = job['dataset']
+        seed_supports[dataset] = min(seed_supports.get(dataset, job['min_support']), job['min_support'])
+
+    print(">> Running " + str(len(jobs)) + " jobs over " + str(len(datasets)) + " datasets with " + str(manifest['workers']) + " workers")
+
+    # if the peak memory cannot be reset between tasks, every task needs a fresh worker process
+    # so that its peak memory is not the peak of an earlier task run by the same worker
+    tasks_per_worker = None if reset_peak_memory() else 1
+
+    batch_start = time.time()
+
+    # each dataset's transactions are only sent to the worker that generates its seed itemsets
+    seeds = {}
+    seed_args = [(dataset, seed_support, datasets[dataset][0], datasets[dataset][1]) for dataset, seed_support in sorted(seed_supports.items())]
+    with multiprocessing.Pool(processes=min(manifest['workers'], len(seed_args)), maxtasksperchild=tasks_per_worker) as pool:
+        for seed in pool.imap_unordered(mine_batch_seed, seed_args):
+            dataset, seed_support, itemsets_dict, frequency_set, wall_seconds, peak_memory = seed
+            seeds[dataset] = (seed_support, itemsets_dict, frequency_set)
+            dataset_summary[dataset]['seed_min_support'] = seed_support
+            dataset_summary[dataset]['mining_seconds'] = wall_seconds
+            dataset_summary[dataset]['mining_peak_memory_mb'] = peak_memory
+
+    # the transactions and seed itemsets are sent to each worker once, so a job is just its parameters
+    ordered_jobs = sorted(jobs, key=lambda x: (x['dataset'], x['min_support'], x['min_confidence']))
+    with multiprocessing.Pool(processes=min(manifest['workers'], len(ordered_jobs)), initializer=init_batch_worker, initargs=(datasets, seeds), maxtasksperchild=tasks_per_worker) as pool:
+        job_summary = list(pool.imap_unordered(run_batch_job, ordered_jobs))
+    batch_end = time.time()
+
+    # report the jobs in the order they were listed in the manifest
+    job_order = dict([(job['name'], i) for i, job in enumerate(jobs)])
+    job_summary = sorted(job_summary, key=lambda x: job_order[x['name']])
+
+    summary = {
+        'manifest': manifest_filename,
+        'workers': manifest['workers'],
+        'peak_memory_note': 'peak_memory_mb is the peak resident memory of the worker process while it ran the job, '
+                            'including the transactions and seed itemsets held by the worker',
+        'wall_seconds_note': 'the wall time of a job covers filtering the seed itemsets and generating and writing '
+                             'its rules. generating the seed itemsets is reported as mining_seconds of its dataset',
+        'wall_seconds': batch_end-batch_start,
+        'datasets': dataset_summary,
+        'jobs': job_summary,
+    }
+    summary_filename = os.path.join(output_dir, 'summary.json')
+    with open(summary_filename, 'w') as fp:
+        json.dump(summary, fp, indent=4)
+
+    print(">> Finished running " + str(len(jobs)) + " jobs in " + str(batch_end-batch_start) + ". Wrote summary to " + summary_filename)
+    for job in job_summary:
+        print(">> Job " + job['name'] + ": " + str(job['rules']) + " rules in " + str(round(job['wall_seconds'], 4)) + " seconds with a worker peak memory of " + str(job['peak_memory_mb']) + " MB")
+
+
+def load_batch_manifest(manifest_filename):
+    """ Read and validate the json batch manifest. Fills in the defaults for any
+        optional values and resolves relative paths against the directory of
+        the manifest. Exits the program if the manifest is invalid.
+
+        @Input: manifest_filename
+        @Return: manifest
+    """
+    with open(manifest_filename) as fp:
+        try:
+            manifest = json.load(fp)
+        except ValueError as e:
+            print("Batch manifest is not valid json: {}. Exiting...".format(e))
+            sys.exit()
+
+    if not isinstance(manifest, dict):
+        print("Batch manifest must be a json object. Exiting...")
+        sys.exit()
+
+    base_dir = os.path.dirname(os.path.abspath(manifest_filename))
+
+    datasets = manifest.get('datasets', {})
+    jobs = manifest.get('jobs', [])
+    if not isinstance(datasets, dict) or not isinstance(jobs, list) or len(jobs) == 0:
+        print("Batch manifest must contain a datasets object and a non-empty jobs list. Exiting...")
+        sys.exit()
+
+    for dataset, input_filename in datasets.items():
+        if not isinstance(input_filename, str):
+            print("Dataset {} needs a filename string, got {}. Exiting...".format(dataset, input_filename))
+            sys.exit()
+        input_filename = os.path.join(base_dir, input_filename)
+
+        user_file = Path(input_filename)
+        if not user_file.exists() or not user_file.is_file():
+            print("Filename: {} for dataset {} does not exist. Exiting...".format(user_file, dataset))
+            sys.exit()
+        datasets[dataset] = input_filename
+
+    workers = manifest.get('workers', multiprocessing.cpu_count())
+    if not isinstance(workers, int) or isinstance(workers, bool) or workers < 1:
+        print("Batch manifest needs a whole number of workers of at least 1, got {}. Exiting...".format(workers))
+        sys.exit()
+
+    output_dir = manifest.get('output_dir', 'batch_output')
+    if not isinstance(output_dir, str) or output_dir == '':
+        print("Batch manifest needs an output_dir string, got {}. Exiting...".format(output_dir))
+        sys.exit()
+    output_dir = os.path.join(base_dir, output_dir)
+
+    names = set()
+    # the summary is written to the output directory as well, so no job may use its filename
+    outputs = set(['summary.json'])
+    for job in jobs:
+        if not isinstance(job, dict):
+            print("Job {} needs to be a json object. Exiting...".format(job))
+            sys.exit()
+
+        if not isinstance(job.get('dataset'), str) or job['dataset'] not in datasets:
+            print("Job {} uses unknown dataset {}. Exiting...".format(job, job.get('dataset')))
+            sys.exit()
+
+        try:
+            job['min_support'] = float(job['min_support'])
+            job['min_confidence'] = float(job['min_confidence'])
+        except (KeyError, TypeError, ValueError):
+            print("Job {} needs a numeric min_support and min_confidence. Exiting...".format(job))
+            sys.exit()
+
+        if not 0 < job['min_support'] <= 1 or not 0 < job['min_confidence'] <= 1:
+            print("Job {} needs a min_support and min_confidence between 0 and 1. Exiting...".format(job))
+            sys.exit()
+
+        if not isinstance(job.get('algorithm', 'apriori'), str):
+            print("Job {} needs an algorithm string. Exiting...".format(job))
+            sys.exit()
+
+        job['algorithm'] = job.get('algorithm', 'apriori').lower()
+        if job['algorithm'] not in BATCH_ALGORITHMS:
+            print("Job {} uses unknown algorithm {}. Expected one of {}. Exiting...".format(job, job['algorithm'], BATCH_ALGORITHMS))
+            sys.exit()
+
+        if 'name' not in job:
+            job['name'] = "{}-{}-s{}-c{}".format(job['dataset'], job['algorithm'], job['min_support'], job['min_confidence'])
+        output = job.get('output', job['name'] + '.txt')
+
+        # names and outputs are filenames inside of the output directory, not paths
+        for value in [job['name'], output]:
+            if not is_plain_filename(value):
+                print("Job {} needs a name and output that are plain filenames, got {}. Exiting...".format(job, value))
+                sys.exit()
+
+        if job['name'] in names:
+            print("Job name {} is used more than once. Exiting...".format(job['name']))
+            sys.exit()
+        if output in outputs:
+            print("Job output {} is already used by another job or by the batch summary. Exiting...".format(output))
+            sys.exit()
+        names.add(job['name'])
+        outputs.add(output)
+
+        job['output'] = os.path.join(output_dir, output)
+
+    manifest['datasets'] = datasets
+    manifest['output_dir'] = output_dir
+    manifest['workers'] = workers
+    return manifest
+
+
+def is_plain_filename(value):
+    """ Check that a value from the batch manifest is a string that can be
+        used as a filename inside of the output directory.
+
+        @Input: value
+        @Return: True or False
+    """
+    if not isinstance(value, str) or value in ('', '.', '..'):
+        return False
+    return '/' not in value and os.sep not in value and (os.altsep is None or os.altsep not in value)
+
+
+def init_batch_worker(datasets, seeds):
+    """ Store the encoded transactions and the seed itemsets of every dataset
+        in the worker process so that they are only sent to each worker once
+        instead of once per job.
+
+        @Input: datasets, seeds
+        @Return: None
+    """
+    global batch_datasets
+    global batch_seeds
+    batch_datasets = datasets
+    batch_seeds = seeds
+
+
+def mine_batch_seed(args):
+    """ Generate the itemsets of a dataset at the lowest support of its jobs.
+        Only the support counts of the frequent itemsets are kept, since those
+        are the only ones needed to generate rules.
+
+        @Input: (dataset, min_support, transaction_list, items)
+        @Return: dataset, min_support, global_itemset_dict, frequency_set, wall_seconds, peak_memory_mb
+    """
+    dataset, min_support, transaction_list, items = args
+
+    reset_peak_memory()
+    start = time.time()
+    global_itemset_dict, frequency_set = apriori.apriori(transaction_list, items, min_support)
+    frequent_set = defaultdict(int, [(item, frequency_set[item]) for itemsets in global_itemset_dict.values() for item in itemsets])
+    end = time.time()
+
+    return dataset, min_support, global_itemset_dict, frequent_set, end-start, get_peak_memory_mb()
+
+
+def run_batch_job(job):
+    """ Run a single batch job from the itemsets generated at the seed support
+        of its dataset and write its association rules to its output file.
+
+        @Input: job
+        @Return: job summary
+    """
+    transaction_list, _, integer_to_data = batch_datasets[job['dataset']]
+    seed_support, global_itemset_dict, frequency_set = batch_seeds[job['dataset']]
+    N = len(transaction_list)
+
+    reset_peak_memory()
+    start = time.time()
+    itemsets_dict = apriori.filter_itemsets_by_support(global_itemset_dict, frequency_set, job['min_support'], N)
+    association_rules, output_header = apriori.derive_association_rules(itemsets_dict, frequency_set, integer_to_data, job['min_support'], job['min_confidence'], N)
+
+    if len(association_rules) == 0:
+        print("No association rules to serialize for job " + job['name'])
+    else:
+        serialize_rules(itemsets_dict, association_rules, output_header, job['output'])
+    end = time.time()
+
+    return {
+        'name': job['name'],
+        'dataset': job['dataset'],
+        'algorithm': job['algorithm'],
+        'min_support': job['min_support'],
+        'min_confidence': job['min_confidence'],
+        'seeded_from_support': seed_support,
+        'rules': len(association_rules),
+        'output': job['output'] if len(association_rules) > 0 else None,
+        'wall_seconds': end-start,
+        'peak_memory_mb': get_peak_memory_mb(),
+    }
+
+
+def reset_peak_memory():
+    """ Reset the peak resident memory of the current process, so that the next
+        call to get_peak_memory_mb only covers what happens after this call.
+        This is only possible on linux, by writing 5 to /proc/self/clear_refs.
+
+        @Input: None
+        @Return: True if the peak memory was reset, otherwise False
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as fp:
+            fp.write('5')
+        return True
+    except (IOError, OSError):
+        return False
+
+
+def get_peak_memory_mb():
+    """ Get the peak resident memory of the current process so far in MB,
+        or None if it cannot be measured on this platform.
+
+        @Input: None
+        @Return: peak_memory_mb
+    """
+    if resource is None:
+        return None
+
+    peak_memory = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes everywhere else
+    if sys.platform == 'darwin':
+        return round(peak_memory / (1024 * 1024), 2)
+    return round(peak_memory / 1024, 2)
+
+
 if __name__ == '__main__':
     main()
\ No newline at end of file